@@ -1,11 +1,16 @@
 # Copyright 2019-present B. S. Chambers --- Distributed under GPL, version 3
 
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import StringIO
 import re
+from types import MappingProxyType
 
 ############################# VARIABLES ##############################
 
-default_settings = [True, True, True, True, True, True]
+default_settings = (True, True, True, True, True, True)
 
 def get_flag_encode_retain_unknown(settings):
     """If True then unknown characters and square-bracket-wrapped literal passages
@@ -185,11 +190,20 @@ def pad_and_trim_settings_list(settings):
     decode_unwrap_literals
     """
     out = []
-    temp = settings.copy()
+    temp = list(settings)
     for n in range(6):
         out.append(temp.pop(0) if temp else True)
     return out
 
+def compile_settings(settings_str):
+    """Unpack a settings-string and return the six settings as a tuple.
+
+    The tuple can be shared between threads and re-used for many calls to the
+    lower level functions which take a settings argument.
+    """
+    settings = unpack_settings_string(settings_str)
+    return tuple(pad_and_trim_settings_list(settings))
+
 def is_wrapped_literal(text):
     """Returns TEXT if TEXT is a properly formed bracketed literal string, otherwise returns NIL.
 
@@ -235,33 +249,157 @@ def split_text(text):
     """Split string by whitespace, but treat any passage contained within square
     brackets as a single word, even if it contains whitespace.
     """
-    start = 0
-    index = 0
+    return [text[start:end] for (start, end) in split_text_spans(text)]
+
+split_pattern = re.compile(r"[^ \[\]]+|[\[\]]| +")
+
+def split_text_spans(chunks):
+    """Generator yielding the (start, end) offsets of each word which split_text
+    would find in the text made by joining CHUNKS, as soon as the word is
+    complete.
+
+    Words and square-bracketed passages may straddle chunk boundaries. A plain
+    string is also accepted, in which case it is treated as a single chunk.
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    # offset of the current chunk in the whole text
+    offset = 0
+    word_start = -1
     num_parens_open = 0
-    current_char = ""
-    out = []
-    # iterate one character at a time
-    while index < len(text):
-        current_char = text[index]
-        # count number of square brackets opened & closed
-        if current_char == "[":
-            num_parens_open += 1
-        elif current_char == "]":
-            num_parens_open -= 1
-            if num_parens_open < 0:
-                num_parens_open = 0
-        # if parentheses are balanced, check for space
-        elif num_parens_open == 0 and current_char == " ":
-            # only add if string has non-zero length
-            if start != index:
-                out.append(text[start:index])
-            # start next chunk
-            start = index + 1
-        index += 1
-    # add final word
-    if start != index:
-        out.append(text[start:index])
-    return out
+    for chunk in chunks:
+        for m in split_pattern.finditer(chunk):
+            index = m.start()
+            char = chunk[index]
+            # if parentheses are balanced, space ends the current word
+            if char == " " and num_parens_open == 0:
+                if word_start >= 0:
+                    yield (word_start, offset + index)
+                    word_start = -1
+                continue
+            # count number of square brackets opened & closed
+            if char == "[":
+                num_parens_open += 1
+            elif char == "]" and num_parens_open > 0:
+                num_parens_open -= 1
+            if word_start < 0:
+                word_start = offset + index
+        offset += len(chunk)
+    # yield final word
+    if word_start >= 0:
+        yield (word_start, offset)
+
+def split_text_chunks(chunks):
+    """Generator version of split_text which accepts the text as an iterable of
+    string chunks, yielding each word as soon as it is complete.
+
+    Words and square-bracketed passages may straddle chunk boundaries. A plain
+    string is also accepted, in which case it is treated as a single chunk.
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    # chunks which may still hold part of a word, and the offset of the first
+    pending = deque()
+    pending_start = 0
+
+    def read_chunks():
+        for chunk in chunks:
+            pending.append(chunk)
+            yield chunk
+
+    for (start, end) in split_text_spans(read_chunks()):
+        text = pending[0] if len(pending) == 1 else "".join(pending)
+        yield text[start - pending_start:end - pending_start]
+        # drop chunks which end before this word does
+        while len(pending) > 1 and pending_start + len(pending[0]) <= end:
+            pending_start += len(pending.popleft())
+
+def split_symbols(chunks):
+    """Split text into the symbols which encoding operates on, yielding each one
+    in turn: either a single character or a complete square-bracketed literal
+    passage.
+
+    Like split_text_chunks, accepts a string or an iterable of string chunks. An
+    opening square-bracket which is never matched is yielded as a single
+    character and the text following it is split as normal. Note that encode
+    raises IndexError for such text instead, and that since it is not known
+    whether a bracket is matched until the closing bracket is found, everything
+    after an unmatched bracket is held in memory until the end of the text.
+    """
+    for (symbols, is_literal) in split_symbol_runs(chunks):
+        if is_literal:
+            yield symbols
+        else:
+            yield from symbols
+
+bracket_pattern = re.compile(r"[\[\]]")
+
+def split_symbol_runs(chunks):
+    """Does the work of split_symbols, but yields tuples of (symbols, is_literal),
+    where SYMBOLS is either a literal passage or a run of single characters
+    which contains no opening square-bracket.
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    num_parens_open = 0
+    literal = []
+    for chunk in chunks:
+        index = 0
+        while index < len(chunk):
+            if num_parens_open:
+                # skip straight to the next bracket
+                m = bracket_pattern.search(chunk, index)
+                if m is None:
+                    literal.append(chunk[index:])
+                    break
+                literal.append(chunk[index:m.end()])
+                index = m.end()
+                if m.group() == "[":
+                    num_parens_open += 1
+                else:
+                    num_parens_open -= 1
+                    if num_parens_open == 0:
+                        yield ("".join(literal), True)
+                        literal = []
+            else:
+                # everything up to the next opening bracket is single characters
+                bracket = chunk.find("[", index)
+                if bracket < 0:
+                    bracket = len(chunk)
+                if bracket > index:
+                    yield (chunk[index:bracket], False)
+                if bracket < len(chunk):
+                    num_parens_open = 1
+                    literal.append("[")
+                index = bracket + 1
+    # unbalanced literal at end of text: treat bracket as ordinary character
+    if literal:
+        for symbol in split_unbalanced_symbols(list("".join(literal))):
+            yield (symbol, len(symbol) > 1)
+
+def split_unbalanced_symbols(chars):
+    """Split the list of characters CHARS into symbols as split_symbols does, where
+    the opening square-bracket at the start of CHARS is known to be unmatched.
+
+    Brackets are matched up in a single pass, using a stack of the positions of
+    the brackets still open.
+    """
+    closing = {}
+    stack = []
+    for (index, char) in enumerate(chars):
+        if char == "[":
+            stack.append(index)
+        elif char == "]" and stack:
+            closing[stack.pop()] = index
+    index = 0
+    while index < len(chars):
+        end = closing.get(index)
+        if end is None:
+            yield chars[index]
+            index += 1
+        else:
+            yield "".join(chars[index:end + 1])
+            index = end + 1
 
 ############################## ENCODING ##############################
 
@@ -295,19 +433,44 @@ def encode_symbol_at(text, index, cipher=default_cipher, settings=default_settin
     # literal passage
     literal = literal_passage_at(text, index)
     if literal:
-        if not get_flag_encode_retain_unknown(settings):
-            return (None, len(literal))
-        elif get_flag_encode_unwrap_literals(settings):
-            return (unwrap_wrapped_literal(literal), len(literal))
-        else:
-            return (literal, len(literal))
+        return (encode_literal(literal, settings), len(literal))
     # any other (single character) symbol
     return (encode_char(text[index], cipher, settings), 1)
 
+def encode_literal(literal, settings=default_settings):
+    """Returns the encoded value of a square-bracketed literal passage, or None if
+    it is to be discarded.
+    """
+    if not get_flag_encode_retain_unknown(settings):
+        return None
+    elif get_flag_encode_unwrap_literals(settings):
+        return unwrap_wrapped_literal(literal)
+    return literal
+
+def encode_symbols(text, cipher=default_cipher, settings=default_settings):
+    """Generator which encodes TEXT one symbol at a time, yielding a tuple of
+    (encoded, kind) for each symbol.
+
+    TEXT may be a string or an iterable of string chunks (see split_symbols).
+
+    KIND is one of "symbol" (found in the cipher), "literal" (square-bracketed
+    literal passage) or "unknown". ENCODED is None or empty if the symbol is
+    discarded due to the settings.
+    """
+    for symbol in split_symbols(text):
+        if len(symbol) > 1:
+            yield (encode_literal(symbol, settings), "literal")
+        elif symbol.lower() in cipher:
+            yield (encode_char(symbol, cipher, settings), "symbol")
+        else:
+            yield (encode_char(symbol, cipher, settings), "unknown")
+
 def encode(text, cipher=default_cipher, settings_str=""):
     """Encode a string using the specified cipher and settings."""
-    settings = unpack_settings_string(settings_str)
-    settings = pad_and_trim_settings_list(settings)
+    return encode_text(text, cipher, compile_settings(settings_str))
+
+def encode_text(text, cipher=default_cipher, settings=default_settings):
+    """Encode a string using the specified cipher and already unpacked settings."""
     index = 0
     words = []
     while index < len(text):
@@ -354,19 +517,33 @@ def get_match_if_complete(text, match_items):
                 return (text, m)
     return None
 
-def decode(text, cipher=default_cipher, settings_str=""):
-    """Decode a string using the specified cipher and settings."""
-    settings = unpack_settings_string(settings_str)
-    settings = pad_and_trim_settings_list(settings)
+def decode_symbols(words, cipher=default_cipher, settings=default_settings):
+    """Generator which does the work of decode, yielding a tuple of (decoded, kind)
+    for each symbol or unknown word found.
 
-    words = split_text(text)
+    WORDS may be any iterable of words, such as the output of split_text or
+    split_text_chunks.
+
+    KIND is one of "symbol" (found in the cipher), "literal" (square-bracketed
+    literal passage) or "unknown". DECODED is None if the word is discarded due
+    to the settings.
+    """
+    words = iter(words)
+    pushed_back = []
     current_chunk = ""
     fully_matched_item = None
-    output_list = []
 
-    while words:
+    while True:
+        # take next word, preferring any remainder put back by a previous step
+        if pushed_back:
+            word = pushed_back.pop()
+        else:
+            word = next(words, None)
+            if word is None:
+                break
+
         # update variables
-        current_chunk = join_strings(current_chunk, words.pop(0))
+        current_chunk = join_strings(current_chunk, word)
         matches = get_match_list(current_chunk, cipher)
         is_valid = len(matches) > 0
 
@@ -379,37 +556,450 @@ def decode(text, cipher=default_cipher, settings_str=""):
         else:
             # CHUNK NOT VALID:
             if fully_matched_item:
-                # add match to output_list
-                output_list.append(fully_matched_item[1][0])
+                # yield match
+                yield (fully_matched_item[1][0], "symbol")
                 # put remainder back on words list
                 unmatched_part = current_chunk[len(fully_matched_item[0]):]
-                words.insert(0, unmatched_part.strip())
-
-            # no complete chunks: retain untranslated chunk if required by settings
-            elif get_flag_decode_retain_unknown(settings):
-                # wrapped literal: unwrap if required by settings
-                if is_wrapped_literal(current_chunk):
-                    if get_flag_decode_unwrap_literals(settings):
-                        output_list.append(unwrap_wrapped_literal(current_chunk))
-                    else:
-                        output_list.append(current_chunk)
-                # other unknown symbol: add wrapping if required by settings
+                pushed_back.append(unmatched_part.strip())
+
+            # wrapped literal: unwrap if required by settings
+            elif is_wrapped_literal(current_chunk):
+                if not get_flag_decode_retain_unknown(settings):
+                    yield (None, "literal")
+                elif get_flag_decode_unwrap_literals(settings):
+                    yield (unwrap_wrapped_literal(current_chunk), "literal")
                 else:
-                    if get_flag_decode_wrap_unknown(settings):
-                        output_list.append("[" + current_chunk + "]")
-                    else:
-                        output_list.append(current_chunk)
+                    yield (current_chunk, "literal")
+
+            # other unknown symbol: add wrapping if required by settings
+            elif not get_flag_decode_retain_unknown(settings):
+                yield (None, "unknown")
+            elif get_flag_decode_wrap_unknown(settings):
+                yield ("[" + current_chunk + "]", "unknown")
+            else:
+                yield (current_chunk, "unknown")
 
             # always reset if not valid
             current_chunk = ""
             fully_matched_item = None
 
-    # word-list exhausted: if there is a complete item add to output list
+    # word-list exhausted: if there is a complete item yield it
     if fully_matched_item:
-        output_list.append(fully_matched_item[1][0])
+        yield (fully_matched_item[1][0], "symbol")
+
+def new_trie_node():
+    """Return an empty node for the word trie of a compiled cipher.
+
+    children -- maps the vocabulary id of a code word to the next node
+    partial -- vocabulary ids of words which are the start of a child word
+    key -- the key of the first cipher item with a code ending at this node
+    """
+    return {"children": {}, "partial": set(), "key": None}
+
+def freeze_trie_node(node):
+    """Return a read-only copy of NODE and all of its children."""
+    children = {k : freeze_trie_node(v) for (k, v) in node["children"].items()}
+    return MappingProxyType({"children": MappingProxyType(children),
+                             "partial": frozenset(node["partial"]),
+                             "key": node["key"]})
+
+# node reached when the last word of a chunk is only the start of a code word
+dead_end_node = freeze_trie_node(new_trie_node())
+
+def compile_cipher(cipher):
+    """Compile CIPHER for decoding into a mapping containing a vocabulary, which maps
+    each code word (and every prefix of it) to an integer id, and a trie of
+    codes stored as sequences of those ids.
+
+    "simple" is False if the cipher cannot be represented this way (it is
+    empty, or a code contains square-brackets or stray whitespace), in which
+    case decoding falls back to matching strings with get_match_list.
+
+    The result, including its copy of CIPHER, is read-only, so one compiled
+    cipher can safely be shared between threads. Recently compiled ciphers are
+    cached, keyed on their contents, so changes to CIPHER are always seen.
+    """
+    return compile_cipher_items(tuple((k, tuple(v)) for (k, v) in cipher.items()))
+
+@lru_cache(maxsize=32)
+def compile_cipher_items(items):
+    """Does the work of compile_cipher, given a tuple of (key, codes) pairs."""
+    vocabulary = {}
+    root = new_trie_node()
+    simple = len(items) > 0
+    for (key, values) in items:
+        for value in values:
+            words = value.split(" ")
+            if not all(w and w == w.strip() and "[" not in w for w in words):
+                simple = False
+                continue
+            node = root
+            for w in words:
+                for n in range(1, len(w)):
+                    node["partial"].add(vocabulary.setdefault(w[:n], len(vocabulary)))
+                word_id = vocabulary.setdefault(w, len(vocabulary))
+                node = node["children"].setdefault(word_id, new_trie_node())
+            # first matching item wins, as in get_match_if_complete
+            if node["key"] is None:
+                node["key"] = key
+    return MappingProxyType({"cipher": MappingProxyType(dict(items)),
+                             "vocabulary": MappingProxyType(vocabulary),
+                             "max_word_length": max(map(len, vocabulary), default=0),
+                             "root": freeze_trie_node(root),
+                             "simple": simple})
+
+def tokenize(text, compiled):
+    """Split TEXT in the same way as split_text, but return a tuple of three
+    arrays (ids, starts, ends) rather than a list of strings.
+
+    ids -- vocabulary id of each word in COMPILED, or -1 if not in vocabulary
+    starts, ends -- offsets of each word in TEXT
+
+    Surrounding whitespace is excluded from each word, and words which are
+    nothing but whitespace are dropped, since join_strings would discard them.
+    """
+    vocabulary = compiled["vocabulary"]
+    max_word_length = compiled["max_word_length"]
+    ids = array("l")
+    starts = array("l")
+    ends = array("l")
+
+    for (start, end) in split_text_spans(text):
+        # exclude surrounding whitespace, and drop words which are nothing else
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            if end - start <= max_word_length:
+                ids.append(vocabulary.get(text[start:end], -1))
+            else:
+                ids.append(-1)
+            starts.append(start)
+            ends.append(end)
+    return (ids, starts, ends)
+
+def next_trie_node(node, word_id):
+    """Return the node reached by adding a word to a chunk which has reached NODE,
+    dead_end_node if the word is only the start of a code word, or None if the
+    chunk no longer matches the start of any code.
+    """
+    child = node["children"].get(word_id)
+    if child is not None:
+        return child
+    if word_id in node["partial"]:
+        return dead_end_node
+    return None
+
+def match_word_ids(ids, compiled):
+    """Generator which runs a cursor over the vocabulary ids IDS using the trie of
+    COMPILED, in the same way as decode_symbols matches chunk strings.
+
+    Yields a tuple of (key, end) for each chunk found, where KEY is the key of
+    the matching cipher item, or None if the chunk is unknown, and END is the
+    index of the word after the chunk. Each chunk begins where the last one
+    ended. An incomplete chunk at the end of IDS is not yielded.
+
+    IDS may be any iterable, and only the ids of the current chunk are kept.
+    """
+    root = compiled["root"]
+    node = root
+    # ids of the current chunk, and index of the word after it
+    chunk = []
+    end = 0
+    # most recent complete match: key and number of words in chunk it covers
+    matched_key = None
+    matched_length = 0
+
+    for word_id in ids:
+        chunk.append(word_id)
+        end += 1
+        node = next_trie_node(node, word_id)
+
+        if node is None and matched_key is not None:
+            # CHUNK NOT VALID: yield match, then try remainder as a single chunk
+            yield (matched_key, end - len(chunk) + matched_length)
+            del chunk[:matched_length]
+            matched_key = None
+            node = root
+            for remaining_id in chunk:
+                node = next_trie_node(node, remaining_id)
+                if node is None:
+                    break
+
+        if node is not None:
+            # CHUNK IS VALID: is it complete?
+            if node["key"] is not None:
+                matched_key = node["key"]
+                matched_length = len(chunk)
+            continue
+
+        # no complete chunks: always reset if not valid
+        yield (None, end)
+        chunk = []
+        node = root
+
+    # words exhausted: if there is a complete item yield it
+    if matched_key is not None:
+        yield (matched_key, end - len(chunk) + matched_length)
+
+def decode_unknown(words, is_literal, settings=default_settings):
+    """Return a tuple of (decoded, kind) for an unknown chunk made up of WORDS,
+    retaining and wrapping or unwrapping it as required by settings.
+
+    WORDS is only joined together if the chunk is to be retained.
+    """
+    kind = "literal" if is_literal else "unknown"
+    if not get_flag_decode_retain_unknown(settings):
+        return (None, kind)
+    chunk = " ".join(words)
+    if is_literal:
+        if get_flag_decode_unwrap_literals(settings):
+            chunk = unwrap_wrapped_literal(chunk)
+    elif get_flag_decode_wrap_unknown(settings):
+        chunk = "[" + chunk + "]"
+    return (chunk, kind)
+
+def decode_tokens(text, compiled, settings=default_settings):
+    """Generator giving the same results as decode_symbols(split_text(TEXT)), but
+    running match_word_ids over the output of tokenize, instead of building and
+    re-matching chunk strings.
+    """
+    if not compiled["simple"]:
+        yield from decode_symbols(split_text(text), compiled["cipher"], settings)
+        return
+
+    (ids, starts, ends) = tokenize(text, compiled)
+    start = 0
+    for (key, end) in match_word_ids(ids, compiled):
+        if key is not None:
+            yield (key, "symbol")
+        else:
+            is_literal = text[starts[start]] == "[" and text[ends[end - 1] - 1] == "]"
+            words = (text[starts[n]:ends[n]] for n in range(start, end))
+            yield decode_unknown(words, is_literal, settings)
+        start = end
+
+def decode_words(words, compiled, settings=default_settings):
+    """Generator giving the same results as decode_symbols(WORDS), using
+    match_word_ids with the trie of COMPILED.
+
+    WORDS may be any iterable of words, such as the output of
+    split_text_chunks. It is read lazily, and only the words of the current
+    chunk are kept.
+    """
+    if not compiled["simple"]:
+        yield from decode_symbols(words, compiled["cipher"], settings)
+        return
+
+    vocabulary = compiled["vocabulary"]
+    pending = deque()
+
+    def word_ids():
+        for word in words:
+            # whitespace-only words are dropped, as in tokenize
+            word = word.strip()
+            if word:
+                pending.append(word)
+                yield vocabulary.get(word, -1)
+
+    start = 0
+    for (key, end) in match_word_ids(word_ids(), compiled):
+        chunk = [pending.popleft() for n in range(end - start)]
+        if key is not None:
+            yield (key, "symbol")
+        else:
+            is_literal = chunk[0][:1] == "[" and chunk[-1][-1:] == "]"
+            yield decode_unknown(chunk, is_literal, settings)
+        start = end
+
+def decode(text, cipher=default_cipher, settings_str=""):
+    """Decode a string using the specified cipher and settings."""
+    return decode_text(text, compile_cipher(cipher), compile_settings(settings_str))
 
+def decode_text(text, compiled, settings=default_settings):
+    """Decode a string using an already compiled cipher and unpacked settings."""
     # join everything together with no spaces
     output = StringIO()
-    for s in output_list:
-        output.write(s)
+    for (s, kind) in decode_tokens(text, compiled, settings):
+        if s:
+            output.write(s)
     return output.getvalue()
+
+############################# STATISTICS #############################
+
+# texts up to this length are counted one symbol at a time by encode_stats
+short_text_length = 64
+
+def encode_stats_short(text, cipher=default_cipher, settings=default_settings):
+    """Does the work of encode_stats for a short string, without the set-up cost
+    of counting characters in bulk.
+    """
+    retain_unknown = get_flag_encode_retain_unknown(settings)
+    wrap_unknown = get_flag_encode_wrap_unknown(settings)
+    symbol_count = unknown_count = literal_count = 0
+    length = 0
+    num_words = 0
+    for symbol in (split_symbols(text) if "[" in text else text):
+        if len(symbol) > 1:
+            literal_count += 1
+            w = encode_literal(symbol, settings)
+            w_length = len(w) if w else 0
+        else:
+            # as encode_char, but only finding the length
+            c = symbol.lower()
+            values = cipher.get(c)
+            if values is not None:
+                symbol_count += 1
+                w_length = len(values[0])
+            else:
+                unknown_count += 1
+                w_length = (len(c) + 2 if wrap_unknown else len(c)) if retain_unknown else 0
+        if w_length:
+            length += w_length
+            num_words += 1
+    return {"encoded_length": length + max(num_words - 1, 0),
+            "symbol_count": symbol_count,
+            "unknown_count": unknown_count,
+            "literal_count": literal_count}
+
+def encode_stats(text, cipher=default_cipher, settings_str="", round_trip=False):
+    """Return statistics about the result of encoding TEXT, without building the
+    encoded string.
+
+    TEXT may be a string or an iterable of string chunks (e.g. lines read from a
+    file), and is read in a single pass. The result is a dict containing:
+
+    encoded_length -- exactly len(encode(text, cipher, settings_str))
+    symbol_count -- number of characters found in the cipher
+    unknown_count -- number of unknown characters (retained or not)
+    literal_count -- number of square-bracketed literal passages
+
+    If ROUND_TRIP is True then the encoded words are also fed straight into the
+    decoder, and the result includes:
+
+    decoded_length -- exactly len(decode(encoded, cipher, settings_str))
+
+    If TEXT contains an unmatched opening square-bracket, encode raises
+    IndexError but encode_stats counts the bracket as an unknown character (see
+    split_symbols).
+
+    Strings of up to short_text_length characters are counted one symbol at a
+    time, which takes about as long as encode itself; longer texts are counted
+    in bulk, which is where encode_stats is faster (see python3 ic_fuzz.py -b).
+    """
+    settings = compile_settings(settings_str)
+    if not round_trip and isinstance(text, str) and len(text) <= short_text_length:
+        return encode_stats_short(text, cipher, settings)
+    stats = {"encoded_length": 0,
+             "symbol_count": 0,
+             "unknown_count": 0,
+             "literal_count": 0}
+    # kind and encoded word for each single character seen so far
+    char_cache = {}
+
+    def encode_single(char):
+        cached = char_cache.get(char)
+        if cached is None:
+            kind = "symbol" if char.lower() in cipher else "unknown"
+            cached = char_cache[char] = (kind, encode_char(char, cipher, settings))
+        return cached
+
+    if not round_trip:
+        num_words = 0
+        char_counts = Counter()
+        retain_literals = get_flag_encode_retain_unknown(settings)
+        unwrap_literals = get_flag_encode_unwrap_literals(settings)
+        for (symbols, is_literal) in split_symbol_runs(text):
+            if not is_literal:
+                char_counts.update(symbols)
+                continue
+            stats["literal_count"] += 1
+            # literal is retained as-is, or without its brackets (see encode_literal)
+            length = len(symbols) - 2 if unwrap_literals else len(symbols)
+            if retain_literals and length > 0:
+                stats["encoded_length"] += length
+                num_words += 1
+        # then total up each distinct character
+        for (char, count) in char_counts.items():
+            (kind, w) = encode_single(char)
+            stats[kind + "_count"] += count
+            if w:
+                stats["encoded_length"] += len(w) * count
+                num_words += count
+        # one space between each pair of words
+        stats["encoded_length"] += max(num_words - 1, 0)
+        return stats
+
+    def encoded_chunks():
+        for symbol in split_symbols(text):
+            if len(symbol) > 1:
+                (kind, w) = ("literal", encode_literal(symbol, settings))
+            else:
+                (kind, w) = encode_single(symbol)
+            stats[kind + "_count"] += 1
+            if w:
+                if stats["encoded_length"]:
+                    stats["encoded_length"] += 1
+                    yield " "
+                stats["encoded_length"] += len(w)
+                yield w
+
+    stats["decoded_length"] = 0
+    words = split_text_chunks(encoded_chunks())
+    for (s, kind) in decode_words(words, compile_cipher(cipher), settings):
+        if s:
+            stats["decoded_length"] += len(s)
+    return stats
+
+def decode_stats(text, cipher=default_cipher, settings_str=""):
+    """Return statistics about the result of decoding TEXT, without building the
+    decoded string.
+
+    TEXT may be a string or an iterable of string chunks, and is read in a
+    single pass. The result is a dict containing:
+
+    decoded_length -- exactly len(decode(text, cipher, settings_str))
+    symbol_count -- number of codes found in the cipher
+    unknown_count -- number of unknown words (retained or not)
+    literal_count -- number of square-bracketed literal passages
+    """
+    settings = compile_settings(settings_str)
+    stats = {"decoded_length": 0,
+             "symbol_count": 0,
+             "unknown_count": 0,
+             "literal_count": 0}
+    words = split_text_chunks(text)
+    for (s, kind) in decode_words(words, compile_cipher(cipher), settings):
+        stats[kind + "_count"] += 1
+        if s:
+            stats["decoded_length"] += len(s)
+    return stats
+
+############################## BATCHES ###############################
+
+def encode_batch(texts, cipher=default_cipher, settings_str="", max_workers=None):
+    """Encode each of TEXTS on a pool of threads, returning a list of the results
+    in the same order.
+
+    The cipher and settings are frozen once and shared by every thread, so
+    nothing needs to be copied or pickled per text. With the GIL this runs at
+    about the same speed as encoding the texts in a loop. It is expected to
+    scale with MAX_WORKERS on free-threaded builds of Python, but that has not
+    been measured (see ic_fuzz.benchmark_threads).
+    """
+    compiled = compile_cipher(cipher)
+    settings = compile_settings(settings_str)
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(lambda t: encode_text(t, compiled["cipher"], settings), texts))
+
+def decode_batch(texts, cipher=default_cipher, settings_str="", max_workers=None):
+    """Decode each of TEXTS on a pool of threads, returning a list of the results
+    in the same order.
+
+    See encode_batch.
+    """
+    compiled = compile_cipher(cipher)
+    settings = compile_settings(settings_str)
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(lambda t: decode_text(t, compiled, settings), texts))
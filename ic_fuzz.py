@@ -0,0 +1,420 @@
+# Copyright 2019-present B. S. Chambers --- Distributed under GPL, version 3
+
+import argparse
+import random
+import statistics
+import string
+import sys
+import time
+
+import ic_codec as ic
+
+############################## ENGINES ###############################
+
+def small_chunks(text, size=7):
+    """Split TEXT into chunks of SIZE characters, so that streaming engines see
+    words and literal passages straddling chunk boundaries.
+    """
+    return [text[n:n + size] for n in range(0, len(text), size)]
+
+def streaming_encode(text, cipher=ic.default_cipher, settings_str=""):
+    """Encode a string using the streaming encode_symbols generator."""
+    settings = ic.compile_settings(settings_str)
+    symbols = ic.encode_symbols(small_chunks(text), cipher, settings)
+    return " ".join(w for (w, kind) in symbols if w)
+
+def streaming_decode(text, cipher=ic.default_cipher, settings_str=""):
+    """Decode a string using the streaming decode_words generator."""
+    settings = ic.compile_settings(settings_str)
+    words = ic.split_text_chunks(small_chunks(text))
+    return "".join(s for (s, kind) in ic.decode_words(words, ic.compile_cipher(cipher), settings) if s)
+
+def reference_decode(text, cipher=ic.default_cipher, settings_str=""):
+    """Decode a string by matching chunk strings with get_match_list, as decode
+    did before it was moved onto compiled ciphers.
+    """
+    settings = ic.compile_settings(settings_str)
+    words = ic.split_text(text)
+    return "".join(s for (s, kind) in ic.decode_symbols(words, cipher, settings) if s)
+
+def batch_encode(text, cipher=ic.default_cipher, settings_str=""):
+    """Encode a string on a thread pool using encode_batch."""
+    return ic.encode_batch([text], cipher, settings_str)[0]
+
+def batch_decode(text, cipher=ic.default_cipher, settings_str=""):
+    """Decode a string on a thread pool using decode_batch."""
+    return ic.decode_batch([text], cipher, settings_str)[0]
+
+reference_engine = (ic.encode, reference_decode)
+
+mode_index = {"encode" : 0, "decode" : 1}
+
+# engines which start a thread pool for every text, so timing them one text at
+# a time measures pool startup: see benchmark_threads for whole batches
+unbenchmarked_engines = {"batch"}
+
+# ic.encode is the reference encode, so the codec engine only checks decode
+engines = {
+    "codec" : (None, ic.decode),
+    "streaming" : (streaming_encode, streaming_decode),
+    "batch" : (batch_encode, batch_decode)}
+
+def register_engine(name, encode, decode):
+    """Add an engine to be checked against the reference.
+
+    ENCODE and DECODE must have the same signature as ic_codec.encode and
+    ic_codec.decode. Either may be None, in which case that mode is neither
+    checked nor timed.
+    """
+    engines[name] = (encode, decode)
+
+all_settings_strings = ["".join("t" if n & (1 << bit) else "n" for bit in range(6))
+                        for n in range(64)]
+
+############################ RANDOM INPUT ############################
+
+fuzz_words = ["corn", "cob", "mouse", "town", "and", "the", "zebra", "quality",
+              "control", "a", "aa", "b", "ba", "riding", "don't", "x-ray"]
+
+unknown_chars = " ,.!?'2-]"
+
+def random_word(rng):
+    """Return a word which is either taken from fuzz_words or made up from a small
+    alphabet, so that accidental overlaps are likely.
+    """
+    if rng.random() < 0.5:
+        return rng.choice(fuzz_words)
+    return "".join(rng.choice("abcor") for n in range(rng.randint(1, 4)))
+
+def random_phrase(rng, codes):
+    """Return a new code, which may contain or extend one of the existing CODES.
+
+    The same kinds of overlap as in magenta_ornithopter_cipher are produced:
+    codes which begin with other codes ("quality control supervisor"), codes
+    which contain other codes ("Bill and Ted riding the zebra bareback") and
+    alternative capitalisations ("Theodore", "theodore").
+    """
+    choice = rng.random()
+    if codes and choice < 0.2:
+        return rng.choice(codes) + " " + random_word(rng)
+    if codes and choice < 0.35:
+        return random_word(rng) + " " + rng.choice(codes) + " " + random_word(rng)
+    if codes and choice < 0.45:
+        return rng.choice(codes).capitalize()
+    return " ".join(random_word(rng) for n in range(rng.randint(1, 3)))
+
+def random_cipher(rng):
+    """Return a cipher with between one and twenty-six keys, each of which has one
+    to three codes.
+    """
+    keys = rng.sample(string.ascii_lowercase, rng.randint(1, 26))
+    codes = []
+    cipher = {}
+    for key in keys:
+        values = []
+        for n in range(rng.randint(1, 3)):
+            values.append(random_phrase(rng, codes))
+            codes.append(values[-1])
+        cipher[key] = values
+    return cipher
+
+def random_literal(rng, depth=0):
+    """Return a balanced square-bracketed literal passage, possibly nested."""
+    out = "["
+    for n in range(rng.randint(0, 4)):
+        if depth < 2 and rng.random() < 0.2:
+            out += random_literal(rng, depth + 1)
+        else:
+            out += rng.choice(string.ascii_letters + unknown_chars.replace("]", ""))
+    return out + "]"
+
+def random_text(rng, cipher, max_length=40):
+    """Return plain text made up of characters from CIPHER, unknown characters and
+    literal passages.
+    """
+    keys = list(cipher)
+    out = []
+    for n in range(rng.randint(0, max_length)):
+        choice = rng.random()
+        if choice < 0.6:
+            c = rng.choice(keys)
+            out.append(c.upper() if rng.random() < 0.2 else c)
+        elif choice < 0.9:
+            out.append(rng.choice(unknown_chars))
+        else:
+            out.append(random_literal(rng))
+    return "".join(out)
+
+def random_encoded_text(rng, cipher, max_length=20):
+    """Return encoded text made up of codes from CIPHER, partial codes, unknown
+    words, literal passages and extra spaces.
+    """
+    codes = [v for values in cipher.values() for v in values]
+    out = []
+    for n in range(rng.randint(0, max_length)):
+        choice = rng.random()
+        if choice < 0.6:
+            out.append(rng.choice(codes))
+        elif choice < 0.7:
+            out.append(rng.choice(codes).split(" ")[0])
+        elif choice < 0.85:
+            out.append(random_word(rng))
+        else:
+            out.append(random_literal(rng))
+    return rng.choice([" ", "  "]).join(out)
+
+############################## CHECKING ##############################
+
+def has_mode(engine, mode):
+    """Returns True if ENGINE has a function for MODE ("encode" or "decode")."""
+    return engine[mode_index[mode]] is not None
+
+def run_engine(engine, mode, text, cipher, settings_str):
+    """Run the encode or decode function of ENGINE and return the output, or the
+    exception raised.
+    """
+    func = engine[mode_index[mode]]
+    try:
+        return func(text, cipher, settings_str)
+    except Exception as e:
+        return e
+
+def is_mismatch(engine, mode, text, cipher, settings_str):
+    """Returns True if ENGINE does not give the same result as the reference.
+
+    Input for which the reference implementation raises an exception is never
+    counted as a mismatch.
+    """
+    expected = run_engine(reference_engine, mode, text, cipher, settings_str)
+    if isinstance(expected, Exception):
+        return False
+    return run_engine(engine, mode, text, cipher, settings_str) != expected
+
+def minimize_text(text, fails):
+    """Return the shortest text found by removing chunks of TEXT, for which FAILS
+    still returns True.
+    """
+    size = len(text) // 2
+    while size > 0:
+        index = 0
+        while index < len(text):
+            candidate = text[:index] + text[index + size:]
+            if fails(candidate):
+                text = candidate
+            else:
+                index += size
+        size //= 2
+    return text
+
+def minimize_cipher(cipher, fails):
+    """Return a copy of CIPHER with as many keys and alternative codes removed as
+    possible, while FAILS still returns True.
+    """
+    cipher = {k : list(v) for (k, v) in cipher.items()}
+    for key in list(cipher):
+        candidate = {k : v for (k, v) in cipher.items() if k != key}
+        if candidate and fails(candidate):
+            cipher = candidate
+    for key in list(cipher):
+        for value in list(cipher[key]):
+            if len(cipher[key]) > 1:
+                candidate = dict(cipher)
+                candidate[key] = [v for v in cipher[key] if v != value]
+                if fails(candidate):
+                    cipher = candidate
+    return cipher
+
+def minimize_case(engine, mode, text, cipher, settings_str):
+    """Shrink a mismatching case and return it as a tuple of (text, cipher)."""
+    cipher = minimize_cipher(cipher, lambda c: is_mismatch(engine, mode, text, c, settings_str))
+    text = minimize_text(text, lambda t: is_mismatch(engine, mode, t, cipher, settings_str))
+    return (text, cipher)
+
+def fuzz(names=None, iterations=200, seed=0):
+    """Check each named engine against the reference on random ciphers and texts,
+    using every combination of settings.
+
+    Returns a list of minimized mismatching cases, each a dict with keys
+    engine, mode, text, cipher, settings, expected and actual.
+    """
+    rng = random.Random(seed)
+    names = names or list(engines)
+    failures = []
+    for n in range(iterations):
+        cipher = random_cipher(rng)
+        inputs = {"encode" : random_text(rng, cipher),
+                  "decode" : random_encoded_text(rng, cipher)}
+        for name in names:
+            engine = engines[name]
+            for (mode, text) in inputs.items():
+                if not has_mode(engine, mode):
+                    continue
+                for settings_str in all_settings_strings:
+                    if is_mismatch(engine, mode, text, cipher, settings_str):
+                        (t, c) = minimize_case(engine, mode, text, cipher, settings_str)
+                        failures.append({
+                            "engine" : name,
+                            "mode" : mode,
+                            "text" : t,
+                            "cipher" : c,
+                            "settings" : settings_str,
+                            "expected" : run_engine(reference_engine, mode, t, c, settings_str),
+                            "actual" : run_engine(engine, mode, t, c, settings_str)})
+                        # one minimized case per engine and input is enough
+                        break
+    return failures
+
+############################# BENCHMARK ##############################
+
+def time_engine(engine, mode, cases, repeat=3):
+    """Return the best total time in seconds taken by ENGINE over CASES."""
+    best = None
+    for n in range(repeat):
+        start = time.perf_counter()
+        for (text, cipher, settings_str) in cases:
+            run_engine(engine, mode, text, cipher, settings_str)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark(names=None, num_cases=50, seed=0, repeat=3):
+    """Time each named engine against the reference for each of the included
+    ciphers.
+
+    Returns a dict mapping engine name to a dict of
+    {(mode, cipher_name) : ratio}, where ratio is reference time divided by
+    engine time, so values above 1.0 mean the engine is faster. Modes for which
+    an engine has no function are left out.
+
+    By default all engines except unbenchmarked_engines are timed.
+    """
+    rng = random.Random(seed)
+    names = names or [name for name in engines if name not in unbenchmarked_engines]
+    ciphers = {"default" : ic.default_cipher,
+               "magenta_ornithopter" : ic.magenta_ornithopter_cipher,
+               "faberge_zoot_suit" : ic.faberge_zoot_suit_cipher}
+    results = {name : {} for name in names}
+    for (cipher_name, cipher) in ciphers.items():
+        texts = [random_text(rng, cipher, 400) for n in range(num_cases)]
+        settings = [rng.choice(all_settings_strings) for n in range(num_cases)]
+        cases = {"encode" : list(zip(texts, [cipher] * num_cases, settings)),
+                 "decode" : [(ic.encode(t, cipher, s), cipher, s)
+                             for (t, s) in zip(texts, settings)]}
+        for (mode, mode_cases) in cases.items():
+            reference_time = time_engine(reference_engine, mode, mode_cases, repeat)
+            for name in names:
+                if not has_mode(engines[name], mode):
+                    continue
+                engine_time = time_engine(engines[name], mode, mode_cases, repeat)
+                results[name][(mode, cipher_name)] = reference_time / engine_time
+    return results
+
+def benchmark_stats(seed=0, repeat=5):
+    """Time encode_stats against encode on short and long texts for each of the
+    included ciphers.
+
+    Returns a dict mapping (cipher_name, text_length) to encode time divided by
+    encode_stats time, so values above 1.0 mean encode_stats is faster.
+    """
+    rng = random.Random(seed)
+    ciphers = {"default" : ic.default_cipher,
+               "magenta_ornithopter" : ic.magenta_ornithopter_cipher,
+               "faberge_zoot_suit" : ic.faberge_zoot_suit_cipher}
+    results = {}
+    for (cipher_name, cipher) in ciphers.items():
+        # many short texts, as for per-request quota checks, or a few long ones
+        for (text_length, num_texts) in ((10, 2000), (20000, 5)):
+            texts = []
+            while len(texts) < num_texts:
+                text = random_text(rng, cipher, text_length)
+                texts.append((text * text_length)[:text_length])
+            cases = [(t, cipher, "") for t in texts]
+            stats_engine = (lambda t, c, s: ic.encode_stats(t, c, s), None)
+            encode_time = time_engine(reference_engine, "encode", cases, repeat)
+            stats_time = time_engine(stats_engine, "encode", cases, repeat)
+            results[(cipher_name, text_length)] = encode_time / stats_time
+    return results
+
+def is_gil_enabled():
+    """Returns False when running on a free-threaded build of Python with the GIL
+    switched off.
+    """
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+def benchmark_threads(thread_counts=(2, 4, 8), num_texts=64, text_length=2000,
+                      seed=0, repeat=15):
+    """Time encode_batch and decode_batch over the same texts on one thread and
+    on each of THREAD_COUNTS worker threads, using the Magenta Ornithopter
+    cipher.
+
+    Both are run once untimed to warm up. Then, REPEAT times over, each thread
+    count is timed straight after a fresh one-thread run, so that drift in the
+    speed of the machine affects both sides of every ratio alike.
+
+    Returns a dict mapping (mode, threads) to a tuple of (median, lowest,
+    highest) speedup over the REPEAT rounds, where speedup is the one-thread
+    time divided by the time with THREADS threads.
+    """
+    rng = random.Random(seed)
+    cipher = ic.magenta_ornithopter_cipher
+    texts = [random_text(rng, cipher, text_length) for n in range(num_texts)]
+    cases = {"encode" : (ic.encode_batch, texts),
+             "decode" : (ic.decode_batch, [ic.encode(t, cipher) for t in texts])}
+
+    def time_batch(batch, mode_texts, threads):
+        start = time.perf_counter()
+        batch(mode_texts, cipher, max_workers=threads)
+        return time.perf_counter() - start
+
+    results = {}
+    for (mode, (batch, mode_texts)) in cases.items():
+        for threads in (1,) + tuple(thread_counts):
+            time_batch(batch, mode_texts, threads)
+        speedups = {threads : [] for threads in thread_counts}
+        for n in range(repeat):
+            for threads in thread_counts:
+                base_time = time_batch(batch, mode_texts, 1)
+                speedups[threads].append(base_time / time_batch(batch, mode_texts, threads))
+        for (threads, values) in speedups.items():
+            results[(mode, threads)] = (statistics.median(values), min(values), max(values))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check alternative codec engines against the reference encode/decode.")
+    parser.add_argument("-e", "--engine", action="append",
+                        help="engine to check (default: all registered engines)")
+    parser.add_argument("-n", "--iterations", type=int, default=200,
+                        help="number of random ciphers to generate")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-b", "--benchmark", action="store_true",
+                        help="also record timing ratios against the reference")
+    parser.add_argument("-t", "--threads", action="store_true",
+                        help="also record median batch speedup for 2, 4 and 8 threads")
+    args = parser.parse_args()
+
+    failures = fuzz(args.engine, args.iterations, args.seed)
+    for f in failures:
+        print("MISMATCH", f["engine"], f["mode"], repr(f["settings"]))
+        print("    text:    ", repr(f["text"]))
+        print("    cipher:  ", f["cipher"])
+        print("    expected:", repr(f["expected"]))
+        print("    actual:  ", repr(f["actual"]))
+    print(len(failures), "mismatches")
+
+    if args.benchmark:
+        for (name, ratios) in benchmark(args.engine, seed=args.seed).items():
+            for ((mode, cipher_name), ratio) in sorted(ratios.items()):
+                print("{:<12} {:<7} {:<20} {:6.2f}x".format(name, mode, cipher_name, ratio))
+        for ((cipher_name, text_length), ratio) in sorted(benchmark_stats(seed=args.seed).items()):
+            print("{:<12} {:<7} {:<20} {:6.2f}x".format("stats", text_length, cipher_name, ratio))
+
+    if args.threads:
+        print("Python", sys.version.split()[0], "GIL enabled:", is_gil_enabled())
+        for ((mode, threads), (median, low, high)) in sorted(benchmark_threads(seed=args.seed).items()):
+            print("{:<7} {:>2} threads {:6.2f}x (range {:.2f}x to {:.2f}x)".format(
+                mode, threads, median, low, high))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
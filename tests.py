@@ -1,7 +1,9 @@
 # Copyright 2019-present B. S. Chambers --- Distributed under GPL, version 3
 
+import random
 import unittest
 import ic_codec as ic
+import ic_fuzz as fz
 
 class TestInsanityCodec(unittest.TestCase):
 
@@ -301,5 +303,175 @@ class TestInsanityCodec(unittest.TestCase):
         text = 'undermine the fortifications frantic bannana quincunx quality control supervisor'
         self.assertEqual("tame", ic.decode(text, cipher))
 
+    def test_tokenize(self):
+        compiled = ic.compile_cipher(ic.magenta_ornithopter_cipher)
+        text = " corn  [a b] corncob\n zzz  \t "
+        (ids, starts, ends) = ic.tokenize(text, compiled)
+        self.assertEqual(["corn", "[a b]", "corncob", "zzz"],
+                         [text[s:e] for (s, e) in zip(starts, ends)])
+        vocabulary = compiled["vocabulary"]
+        self.assertEqual([vocabulary["corn"], -1, vocabulary["corncob"], -1], list(ids))
+        # prefixes of code words are interned too
+        self.assertTrue("corncob"[:5] in vocabulary)
+
+    def test_compile_cipher_falls_back_for_bracketed_codes(self):
+        self.assertTrue(ic.compile_cipher(ic.faberge_zoot_suit_cipher)["simple"])
+        self.assertFalse(ic.compile_cipher({"a" : ["[x] y"]})["simple"])
+        self.assertFalse(ic.compile_cipher({})["simple"])
+        self.assertEqual("a", ic.decode("[x] y", {"a" : ["[x] y"]}))
+
+    def test_decode_remainder_after_match_is_treated_as_single_chunk(self):
+        cipher = {"a" : ["a"], "d" : ["a b c d"], "b" : ["b"]}
+        self.assertEqual("a[b c x]", ic.decode("a b c x", cipher, "nnnttt"))
+        # incomplete chunk at the end of the text is dropped
+        self.assertEqual("a", ic.decode("a b", cipher, "nnnttt"))
+        self.assertEqual("aa", ic.decode("a a b", cipher, "nnnttt"))
+
+    def test_decode_words_matches_decode(self):
+        cipher = ic.magenta_ornithopter_cipher
+        text = "coming country mouse corncob [ ] corncob  dormouse Bill and Ted riding the zebra x"
+        compiled = ic.compile_cipher(cipher)
+        chunks = [text[n:n + 5] for n in range(0, len(text), 5)]
+        for set_str in ["tttttt", "nnnttn", "nnntnn", "nnnnnn"]:
+            settings = ic.compile_settings(set_str)
+            words = ic.split_text_chunks(chunks)
+            self.assertEqual(list(ic.decode_tokens(text, compiled, settings)),
+                             list(ic.decode_words(words, compiled, settings)))
+
+    def test_match_word_ids_reads_lazily(self):
+        compiled = ic.compile_cipher({"a" : ["x"]})
+        x = compiled["vocabulary"]["x"]
+        def ids():
+            yield x
+            yield -1
+            raise AssertionError("read too far")
+        matches = ic.match_word_ids(ids(), compiled)
+        self.assertEqual(("a", 1), next(matches))
+
+    def test_compile_settings(self):
+        self.assertEqual((True, False, True, True, True, True), ic.compile_settings("tn"))
+        self.assertEqual(ic.default_settings, ic.compile_settings(""))
+
+    def test_compiled_cipher_is_read_only(self):
+        compiled = ic.compile_cipher(ic.magenta_ornithopter_cipher)
+        with self.assertRaises(TypeError):
+            compiled["cipher"]["a"] = ("apple",)
+        with self.assertRaises(TypeError):
+            compiled["root"]["children"][0] = None
+
+    def test_compiled_cipher_cache_sees_changes(self):
+        cipher = {"a" : ["apple"], "b" : ["banana"]}
+        self.assertEqual("ab", ic.decode("apple banana", cipher))
+        cipher["b"] = ["bun"]
+        self.assertEqual("a[banana]", ic.decode("apple banana", cipher))
+
+    def test_encode_and_decode_batch(self):
+        cipher = ic.magenta_ornithopter_cipher
+        texts = ["Hi, [Bob]!", "", "21st of May", "hello"] * 10
+        encoded = ic.encode_batch(texts, cipher, "tttttt", max_workers=4)
+        self.assertEqual([ic.encode(t, cipher, "tttttt") for t in texts], encoded)
+        decoded = ic.decode_batch(encoded, cipher, "tttttt", max_workers=4)
+        self.assertEqual([ic.decode(e, cipher, "tttttt") for e in encoded], decoded)
+
+    ############################# STATISTICS #############################
+
+    def test_split_text_chunks_matches_split_text(self):
+        text = "dog [bannana [flap] jack ] apple  [[crown]] portability"
+        chunks = [text[i:i+3] for i in range(0, len(text), 3)]
+        self.assertEqual(ic.split_text(text), list(ic.split_text_chunks(chunks)))
+        self.assertEqual(ic.split_text(text), list(ic.split_text_chunks(text)))
+
+    def test_split_text_spans_straddle_chunks(self):
+        self.assertEqual([(1, 4), (5, 10), (11, 13), (15, 17)],
+                         list(ic.split_text_spans([" do", "g [a", " b] c", "]  ", "xy"])))
+
+    def test_split_symbols(self):
+        self.assertEqual(["a", " ", "[granny [smith]]", "!"],
+                         list(ic.split_symbols(["a [gran", "ny [smi", "th]]!"])))
+        # unmatched bracket is treated as an ordinary character
+        self.assertEqual(["a", "[", "b", "[c]"], list(ic.split_symbols("a[b[c]")))
+        self.assertEqual(["[", "[a]", "[", "[b[c]]", "d"],
+                         list(ic.split_symbols(["[[a][", "[b[c]]d"])))
+        # long runs of unmatched brackets are split without recursion
+        self.assertEqual(3001, len(list(ic.split_symbols("[" * 3000 + "a"))))
+
+    def test_encode_stats(self):
+        cipher = ic.magenta_ornithopter_cipher
+        text = "Hi, [Bob]! 21st of May"
+        for set_str in ["tttttt", "ttnttt", "tnnnnn", "nnnnnn", "tttnnn"]:
+            encoded = ic.encode(text, cipher, set_str)
+            chunks = [text[:7], text[7:12], text[12:]]
+            stats = ic.encode_stats(chunks, cipher, set_str)
+            self.assertEqual(len(encoded), stats["encoded_length"])
+            self.assertFalse("decoded_length" in stats)
+            self.assertEqual(9, stats["symbol_count"])
+            self.assertEqual(8, stats["unknown_count"])
+            self.assertEqual(1, stats["literal_count"])
+            stats = ic.encode_stats(chunks, cipher, set_str, round_trip=True)
+            self.assertEqual(len(encoded), stats["encoded_length"])
+            self.assertEqual(len(ic.decode(encoded, cipher, set_str)), stats["decoded_length"])
+            self.assertEqual(9, stats["symbol_count"])
+
+    def test_encode_stats_long_text(self):
+        cipher = ic.magenta_ornithopter_cipher
+        rng = random.Random(0)
+        text = "".join(rng.choice(["a", "B", "m", " ", "!", "[x y]", "[]"]) for n in range(5000))
+        for set_str in ["tttttt", "tnnttt", "ttnttt", "nnnnnn"]:
+            stats = ic.encode_stats(text, cipher, set_str)
+            self.assertEqual(len(ic.encode(text, cipher, set_str)), stats["encoded_length"])
+
+    def test_encode_stats_short_text(self):
+        cipher = ic.magenta_ornithopter_cipher
+        for text in ["", "hi", "Hi, [Bob]!", "x [] y", "[x]" * 20]:
+            for set_str in ["tttttt", "tnnttt", "ttnttt", "nnnnnn"]:
+                stats = ic.encode_stats(text, cipher, set_str)
+                self.assertEqual(ic.encode_stats([text], cipher, set_str), stats)
+                self.assertEqual(len(ic.encode(text, cipher, set_str)), stats["encoded_length"])
+
+    def test_decode_stats(self):
+        cipher = ic.magenta_ornithopter_cipher
+        text = "corn fart face quality control supervisor rumble strip [ ] corncob [!]"
+        for set_str in ["nnnttt", "nnnttn", "nnntnn", "nnnnnn"]:
+            stats = ic.decode_stats([text[:20], text[20:], ""], cipher, set_str)
+            self.assertEqual(len(ic.decode(text, cipher, set_str)), stats["decoded_length"])
+            self.assertEqual(4, stats["symbol_count"])
+            self.assertEqual(2, stats["unknown_count"])
+            self.assertEqual(2, stats["literal_count"])
+
+class TestFuzzHarness(unittest.TestCase):
+
+    def test_random_cipher_contains_overlapping_codes(self):
+        rng = random.Random(1)
+        codes = [v for n in range(20) for vals in fz.random_cipher(rng).values() for v in vals]
+        self.assertTrue(any(a != b and b.startswith(a + " ") for a in codes for b in codes))
+        self.assertFalse(any("[" in c for c in codes))
+
+    def test_registered_engines_match_reference(self):
+        self.assertEqual([], fz.fuzz(iterations=5))
+
+    def test_benchmark_skips_per_text_thread_pools(self):
+        results = fz.benchmark(num_cases=1, repeat=1)
+        self.assertFalse("batch" in results)
+        self.assertTrue("codec" in results)
+
+    def test_reference_encode_is_not_checked_against_itself(self):
+        results = fz.benchmark(["codec"], num_cases=1, repeat=1)
+        self.assertEqual({"decode"}, {mode for (mode, cipher_name) in results["codec"]})
+        self.assertTrue(fz.has_mode(fz.engines["streaming"], "encode"))
+
+    def test_benchmark_threads_reports_spread(self):
+        results = fz.benchmark_threads((2,), num_texts=2, text_length=10, repeat=3)
+        self.assertEqual({("encode", 2), ("decode", 2)}, set(results))
+        for (median, low, high) in results.values():
+            self.assertTrue(low <= median <= high)
+
+    def test_mismatch_is_minimized(self):
+        broken = (lambda t, c, s: ic.encode(t.replace("!", "?"), c, s), ic.decode)
+        self.assertTrue(fz.is_mismatch(broken, "encode", "hello!", ic.default_cipher, "tnnnnn"))
+        (text, cipher) = fz.minimize_case(broken, "encode", "hello [there] !x",
+                                          ic.magenta_ornithopter_cipher, "tnnnnn")
+        self.assertEqual("!", text)
+        self.assertEqual(1, len(cipher))
+
 if __name__ == '__main__':
     unittest.main()